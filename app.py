@@ -6,17 +6,26 @@ import torch
 import sys 
 import zipfile
 import time 
+import threading
+import gc
+import tracemalloc
+import hashlib
+import tempfile
+from collections import Counter
 
 # Gerekli bağımlılıkları içe aktar
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 from langchain_core.documents import Document 
+from langchain_core.embeddings import Embeddings
 from google import genai
 from google.genai.types import Content, Part, GenerateContentConfig 
 
 import gradio as gr 
 from typing import List, Dict, Tuple, Optional
 
+from retrieval_cache import RetrievalCache, CachedRetriever
+
 
 # 1. KANONİK VERİLER
 CANONICAL_SURAH_COUNTS = {
@@ -56,6 +65,44 @@ PROCESSED_DATA_PATH = "processed_kuran_documents.json"
 HF_CACHE_PATH = "./hf_model_cache"
 os.environ["HF_HOME"] = HF_CACHE_PATH
 
+# Isınma (Warmup) ayarları: Sistem "Hazır" olmadan önce model, index ve sorgu gömmeleri ısıtılır
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', '1') != '0'
+WARMUP_TOP_N = int(os.environ.get('WARMUP_TOP_N', '50')) # Trafikten türetilen en sık sorgu sayısı
+WARMUP_RETRIEVAL_COUNT = int(os.environ.get('WARMUP_RETRIEVAL_COUNT', '3')) # Isınmada çalıştırılacak örnek retrieval sayısı
+QUERY_EMBEDDING_CACHE_PATH = "query_embedding_cache.json"
+QUERY_TRAFFIC_PATH = "query_traffic_counts.json"
+QUERY_TRAFFIC_FLUSH_EVERY = 10 # Her N RAG sorgusunda trafik sayaçları (arka planda) diske yazılır
+QUERY_TRAFFIC_MAX_ENTRIES = WARMUP_TOP_N * 10 # Bellekte/diskte tutulan en fazla farklı sorgu sayısı
+
+# Bellek profilleme ayarları: MEMORY_PROFILE=1 ile açılır (tracemalloc + bileşen bazlı bellek raporu)
+MEMORY_PROFILE_ENABLED = os.environ.get('MEMORY_PROFILE', '0') == '1'
+MEMORY_PROFILE_INTERVAL = int(os.environ.get('MEMORY_PROFILE_INTERVAL', '300')) # Periyodik snapshot aralığı (saniye)
+MEMORY_PROFILE_LOAD_QUERIES = int(os.environ.get('MEMORY_PROFILE_LOAD_QUERIES', '20')) # Her periyotta sentetik retrieval sayısı
+MEMORY_PROFILE_TOP = int(os.environ.get('MEMORY_PROFILE_TOP', '15')) # Raporlanacak en büyük allocation/büyüme satırı sayısı
+MEMORY_PROFILE_REPORT_PATH = os.environ.get('MEMORY_PROFILE_REPORT_PATH', 'memory_profile_report.jsonl')
+
+# Retrieval sonuç önbelleği: Aynı (normalize) sorgu için vektör araması atlanır; worker'lar arasında SQLite ile paylaşılır
+RETRIEVAL_CACHE_ENABLED = os.environ.get('RETRIEVAL_CACHE_ENABLED', '1') != '0'
+RETRIEVAL_CACHE_PATH = os.environ.get('RETRIEVAL_CACHE_PATH', 'retrieval_cache.sqlite3')
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.environ.get('RETRIEVAL_CACHE_MAX_ENTRIES', '5000')) # LRU üst sınırı
+RETRIEVAL_CACHE_TTL = int(os.environ.get('RETRIEVAL_CACHE_TTL', str(7 * 24 * 3600))) # Kayıt ömrü (saniye)
+
+# Arayüzdeki örnek sorgu tablosu: (Konu Tipi, Örnek Sorgu, Vibe Durumu). Sorgular ısınma kümesine de eklenir.
+UI_SAMPLE_QUERY_ROWS = [
+    ("Sure Parçalı Paylaşım", "Bakara suresi", "Sureyi **part part** okuma **mood'u** ✨"),
+    ("Aralık Sorgusu", "Fatiha 3. ayetten 5. ayete kadar yaz", "**Deep dive** yapma **vibe'ı** 🧐"),
+    ("Konu Sorgulama", "Kuranda güzel söz söylemek", "**Aşırı** referans ayet ve **lit** yorumlar! 🔥"),
+    ("Kanonik Sayı", "Kuranda toplam ayet ve sure sayısı kaçtır?", "Net bilgi: **114 Sure, 6236 Ayet**. **No cap.** 💯"),
+    ("Geçmiş Hatırlama", "şimdiye kadar neler konuştuk?", "Sohbete **throwback** yapma zamanı. 🧠"),
+]
+UI_SAMPLE_QUERIES = [sample_query for _, sample_query, _ in UI_SAMPLE_QUERY_ROWS]
+
+
+if MEMORY_PROFILE_ENABLED and not tracemalloc.is_tracing():
+    # all_documents ve model yüklemesi izlenir; torch/langchain/chromadb/gradio import'ları bu noktadan önce olduğu için
+    # onların import anındaki allocation'ları için uygulamayı PYTHONTRACEMALLOC=25 ile başlatın.
+    tracemalloc.start(25)
+
 
 # 3. VERİ VE DB YÜKLEME
 def load_documents_from_json(file_path: str) -> List[Document] | None:
@@ -115,10 +162,10 @@ def load_vector_db_with_retry():
     # 2. Gömme Modeli Yükleme
     try:
         print(f"Gömme modeli yükleniyor: {EMBEDDING_MODEL} (Cihaz: {device})....")
-        embeddings = HuggingFaceEmbeddings(
+        embeddings = CachedQueryEmbeddings(HuggingFaceEmbeddings(
             model_name=EMBEDDING_MODEL,
             model_kwargs={'device': device}
-        )
+        ))
         print("✅ Gömme modeli başarıyla yüklendi.")
     except Exception as e:
         print(f"KRİTİK HATA: Gömme modeli yüklenirken hata oluştu: {e}", file=sys.stderr)
@@ -159,6 +206,428 @@ def load_vector_db_with_retry():
     raise RuntimeError("Chroma DB yüklemesi tekrar denemelerden sonra başarısız oldu.")
 
 
+# 3.1 ISINMA (WARMUP) VE SORGU GÖMME ÖNBELLEĞİ
+
+def write_json_atomic(file_path: str, data):
+    """JSON'u süreç başına benzersiz bir geçici dosyaya yazıp yerine taşır (worker'lar birbirinin yarım yazımını görmez)."""
+    tmp_file = tempfile.NamedTemporaryFile(
+        'w', encoding='utf-8', dir=os.path.dirname(os.path.abspath(file_path)),
+        prefix=f".{os.path.basename(file_path)}.", suffix=".tmp", delete=False
+    )
+    try:
+        with tmp_file as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_file.name, file_path)
+    except Exception:
+        if os.path.exists(tmp_file.name):
+            os.remove(tmp_file.name)
+        raise
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Sık sorguların gömmelerini bellekte/diskte tutar; önbellekte olmayanlar asıl modele gider.
+       Anahtar sorgunun birebir metnidir: Model büyük/küçük harfe duyarlı olduğu için önbellek cevabı değiştirmemelidir."""
+
+    def __init__(self, base: Embeddings):
+        self.base = base
+        self.query_cache: Dict[str, List[float]] = {}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        cached = self.query_cache.get(text)
+        if cached is not None:
+            return cached
+        return self.base.embed_query(text)
+
+    def warm(self, queries: List[str]) -> int:
+        """Önbellekte olmayan sorguları tek batch'te gömer. Yeni gömülen sorgu sayısını döndürür."""
+        missing = [q for q in dict.fromkeys(queries) if q not in self.query_cache]
+        if not missing:
+            return 0
+        # Not: query_encode_kwargs tanımlı olmadığı için embed_query ile embed_documents aynı vektörü üretir.
+        vectors = self.base.embed_documents(missing)
+        for query, vector in zip(missing, vectors):
+            self.query_cache[query] = [float(x) for x in vector]
+        return len(missing)
+
+    def retain(self, queries: List[str]) -> int:
+        """Yalnızca verilen sorguları tutar (ısınma kümesinden düşenler silinir). Silinen kayıt sayısını döndürür."""
+        keep = set(queries)
+        stale = [q for q in self.query_cache if q not in keep]
+        for query in stale:
+            del self.query_cache[query]
+        return len(stale)
+
+    def load(self, file_path: str) -> int:
+        """Diske kaydedilmiş sorgu gömmelerini yükler (model değişmişse yok sayar)."""
+        if not os.path.exists(file_path):
+            return 0
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("model") != EMBEDDING_MODEL:
+                print(f"[UYARI] Sorgu gömme önbelleği farklı bir modele ait ({data.get('model')}), yok sayılıyor.")
+                return 0
+            self.query_cache.update(data.get("embeddings", {}))
+            return len(data.get("embeddings", {}))
+        except Exception as e:
+            print(f"[UYARI] Sorgu gömme önbelleği okunamadı: {e}", file=sys.stderr)
+            return 0
+
+    def save(self, file_path: str):
+        """Sorgu gömmelerini diske yazar."""
+        try:
+            write_json_atomic(file_path, {"model": EMBEDDING_MODEL, "embeddings": self.query_cache})
+        except Exception as e:
+            print(f"[UYARI] Sorgu gömme önbelleği kaydedilemedi: {e}", file=sys.stderr)
+
+
+query_traffic_counts: Counter = Counter()
+query_traffic_lock = threading.Lock()
+_query_traffic_pending = 0
+_query_traffic_unsaved: Counter = Counter() # Son yazımdan beri gelen sayımlar (diskteki dosyaya eklenir)
+_query_traffic_flush_event = threading.Event()
+_query_traffic_writer_thread = None
+
+
+def prune_query_traffic(counts: Counter) -> Counter:
+    """Sayaçları en sık QUERY_TRAFFIC_MAX_ENTRIES sorguyla sınırlar."""
+    return Counter(dict(counts.most_common(QUERY_TRAFFIC_MAX_ENTRIES)))
+
+
+def load_query_traffic(file_path: str) -> Counter:
+    """Diske kaydedilmiş sorgu sayaçlarını yükler."""
+    if not os.path.exists(file_path):
+        return Counter()
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return prune_query_traffic(Counter(json.load(f)))
+    except Exception as e:
+        print(f"[UYARI] Sorgu trafiği dosyası okunamadı: {e}", file=sys.stderr)
+        return Counter()
+
+
+def save_query_traffic(file_path: str):
+    """Son yazımdan beri gelen sayımları diskteki dosyayla birleştirip yazar; böylece worker'lar birbirinin sayımlarını silmez.
+       (Kilitsiz, best-effort: İki worker aynı anda yazarsa birkaç sayım kaybolabilir.)"""
+    with query_traffic_lock:
+        unsaved = Counter(_query_traffic_unsaved)
+        _query_traffic_unsaved.clear()
+    if not unsaved:
+        return
+    merged = load_query_traffic(file_path)
+    merged.update(unsaved)
+    try:
+        write_json_atomic(file_path, dict(prune_query_traffic(merged)))
+    except Exception as e:
+        print(f"[UYARI] Sorgu trafiği kaydedilemedi: {e}", file=sys.stderr)
+
+
+def query_traffic_writer_loop():
+    """Sayaçları istek thread'ini bekletmeden, arka planda diske yazar."""
+    while True:
+        _query_traffic_flush_event.wait()
+        _query_traffic_flush_event.clear()
+        save_query_traffic(QUERY_TRAFFIC_PATH)
+
+
+def start_query_traffic_writer():
+    """Trafik yazıcı thread'ini bir kez başlatır."""
+    global _query_traffic_writer_thread
+    if _query_traffic_writer_thread is not None:
+        return
+    _query_traffic_writer_thread = threading.Thread(target=query_traffic_writer_loop, name="query-traffic-writer", daemon=True)
+    _query_traffic_writer_thread.start()
+
+
+def record_query_traffic(query: str):
+    """Retriever'a giden sorguyu birebir metniyle sayar; ısınma top-N listesi buradan türetilir."""
+    global _query_traffic_pending
+    with query_traffic_lock:
+        query_traffic_counts[query] += 1
+        _query_traffic_unsaved[query] += 1
+        # Sınırsız büyümeyi önlemek için sınırın iki katına ulaşınca en sık sorgulara budanır
+        if len(query_traffic_counts) > 2 * QUERY_TRAFFIC_MAX_ENTRIES:
+            top_counts = prune_query_traffic(query_traffic_counts)
+            query_traffic_counts.clear()
+            query_traffic_counts.update(top_counts)
+        _query_traffic_pending += 1
+        if _query_traffic_pending >= QUERY_TRAFFIC_FLUSH_EVERY:
+            _query_traffic_pending = 0
+            _query_traffic_flush_event.set()
+
+
+def reaches_retriever(query: str) -> bool:
+    """Sorgu query_rag_system'de vektör aramasına (Tip 0 veya 2) düşüyor mu?"""
+    if handle_simple_greeting(query) or check_for_continue_query(query):
+        return False
+    return check_for_direct_query(query)[3] in (0, 2)
+
+
+def build_warmup_queries(top_n: int) -> List[str]:
+    """Isınma kümesi: sure adları, arayüz örnek sorguları ve trafikten türetilen en sık N sorgu.
+       Yalnızca retriever'a ulaşan sorgular alınır; diğerleri önbellekte hiç kullanılmaz."""
+    surah_queries = [f"{sure_name.capitalize()} suresi ne anlatır?" for sure_name in CANONICAL_SURAH_COUNTS]
+    with query_traffic_lock:
+        top_queries = [q for q, _ in query_traffic_counts.most_common(top_n)]
+    # Sık sorgular önde: örnek retrieval'lar gerçek trafiği temsil etsin
+    candidates = top_queries + UI_SAMPLE_QUERIES + surah_queries
+    return list(dict.fromkeys(q for q in candidates if reaches_retriever(q)))
+
+
+def prefault_vector_index(db_path: str) -> int:
+    """Vektör DB dosyalarını baştan sona okuyarak işletim sistemi sayfa önbelleğine alır. Okunan bayt sayısını döndürür."""
+    total_bytes = 0
+    for root, _, files in os.walk(db_path):
+        for name in files:
+            try:
+                with open(os.path.join(root, name), 'rb') as f:
+                    while True:
+                        chunk = f.read(4 * 1024 * 1024)
+                        if not chunk:
+                            break
+                        total_bytes += len(chunk)
+            except OSError as e:
+                print(f"[UYARI] Index dosyası okunamadı: {name}: {e}", file=sys.stderr)
+    return total_bytes
+
+
+def warmup_system(vector_db, retriever):
+    """Index'i sayfa önbelleğine alır, ısınma kümesini batch'te gömüp kaydeder ve örnek retrieval'lar çalıştırır."""
+    start = time.time()
+
+    prefaulted = prefault_vector_index(VECTOR_DB_PATH)
+    print(f"Isınma: Vektör index'i önbelleğe alındı ({prefaulted / (1024 * 1024):.1f} MB).")
+
+    embeddings = vector_db.embeddings
+    warmup_queries = build_warmup_queries(WARMUP_TOP_N)
+    if isinstance(embeddings, CachedQueryEmbeddings):
+        loaded = embeddings.load(QUERY_EMBEDDING_CACHE_PATH)
+        encoded = embeddings.warm(warmup_queries)
+        # Isınma kümesinden düşen sorgular silinir: Dosya ve bellek ısınma kümesiyle sınırlı kalır
+        dropped = embeddings.retain(warmup_queries)
+        if encoded or dropped:
+            embeddings.save(QUERY_EMBEDDING_CACHE_PATH)
+        print(f"Isınma: {len(warmup_queries)} sorgu hazır ({loaded} diskten, {encoded} yeni gömüldü, {dropped} silindi).")
+
+    for query in warmup_queries[:WARMUP_RETRIEVAL_COUNT]:
+        retriever.invoke(query)
+
+    print(f"✅ Isınma tamamlandı ({time.time() - start:.1f} sn).")
+
+
+# 3.2 BELLEK PROFİLLEME
+
+# tracemalloc allocation'larını dosya yoluna göre bileşenlere ayırmak için kullanılan eşleşmeler
+MEMORY_COMPONENT_PATTERNS = [
+    ("chroma", ("chromadb", "langchain_chroma")),
+    ("torch_embedder", ("torch", "sentence_transformers", "transformers", "tokenizers", "langchain_huggingface")),
+    ("genai_client", ("google/genai", "httpx", "httpcore", "google/auth")),
+    ("gradio", ("gradio", "starlette", "fastapi", "uvicorn", "anyio")),
+    ("langchain", ("langchain_core", "langchain")),
+]
+
+# Gradio state'i oturum başına tutulduğu için chat_history boyutları handler'da izlenir
+chat_history_stats = {"max_turns": 0, "max_chars": 0, "last_turns": 0, "last_chars": 0}
+memory_profiler_thread = None
+
+
+def get_rss_bytes() -> int | None:
+    """Sürecin anlık RSS değerini döndürür (Linux dışında ru_maxrss, yani tepe değer)."""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        try:
+            import resource
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # ru_maxrss macOS'ta bayt, diğer sistemlerde KiB cinsindendir
+            return max_rss if sys.platform == "darwin" else max_rss * 1024
+        except Exception:
+            return None
+
+
+def get_directory_size(path: str) -> int:
+    """Klasördeki dosyaların toplam boyutunu bayt cinsinden döndürür."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def record_chat_history_stats(chat_history: List[List[str]]):
+    """Gradio state'inden gelen sohbet geçmişinin boyutunu kaydeder."""
+    chars = sum(len(turn_text or "") for turn in chat_history for turn_text in turn)
+    chat_history_stats["last_turns"] = len(chat_history)
+    chat_history_stats["last_chars"] = chars
+    chat_history_stats["max_turns"] = max(chat_history_stats["max_turns"], len(chat_history))
+    chat_history_stats["max_chars"] = max(chat_history_stats["max_chars"], chars)
+
+
+def collect_component_memory(snapshot: tracemalloc.Snapshot) -> Dict:
+    """Şüpheli bileşenler için bellek muhasebesi çıkarır."""
+    components = {"rss_bytes": get_rss_bytes()}
+
+    # tracemalloc: Python allocation'larını paket bazında grupla
+    traced = {name: 0 for name, _ in MEMORY_COMPONENT_PATTERNS}
+    traced["app"] = 0
+    traced["other"] = 0
+    app_filename = os.path.abspath(__file__).replace("\\", "/")
+    for stat in snapshot.statistics('filename'):
+        filename = stat.traceback[0].filename.replace("\\", "/")
+        if filename == app_filename:
+            traced["app"] += stat.size
+            continue
+        for name, patterns in MEMORY_COMPONENT_PATTERNS:
+            if any(f"/{pattern}/" in filename for pattern in patterns):
+                traced[name] += stat.size
+                break
+        else:
+            traced["other"] += stat.size
+    components["tracemalloc_by_component"] = traced
+
+    if all_documents is not None:
+        components["all_documents"] = {
+            "count": len(all_documents),
+            "approx_bytes": sum(
+                sys.getsizeof(doc.page_content) + sys.getsizeof(doc.metadata)
+                + sum(sys.getsizeof(v) for v in doc.metadata.values())
+                for doc in all_documents
+            ),
+        }
+
+    vector_db = getattr(kuran_retriever, "vectorstore", None)
+    if vector_db is not None:
+        try:
+            chroma_count = vector_db._collection.count()
+        except Exception:
+            chroma_count = None
+        components["chroma"] = {"count": chroma_count, "disk_bytes": get_directory_size(VECTOR_DB_PATH)}
+
+        embeddings = vector_db.embeddings
+        if isinstance(embeddings, CachedQueryEmbeddings):
+            components["query_embedding_cache"] = {
+                "entries": len(embeddings.query_cache),
+                "approx_bytes": sum(sys.getsizeof(v) + 24 * len(v) for v in embeddings.query_cache.values()),
+            }
+            embeddings = embeddings.base
+        model = getattr(embeddings, "_client", None)
+        if model is not None and hasattr(model, "parameters"):
+            components["torch_embedder"] = {
+                "param_bytes": sum(p.numel() * p.element_size() for p in model.parameters()),
+                "cuda_allocated_bytes": torch.cuda.memory_allocated() if torch.cuda.is_available() else 0,
+            }
+
+    components["genai_client_live_instances"] = sum(1 for obj in gc.get_objects() if isinstance(obj, genai.Client))
+    components["chat_history"] = dict(chat_history_stats)
+    return components
+
+
+def format_memory_stats(stats, limit: int) -> List[str]:
+    """tracemalloc istatistiklerini okunabilir satırlara çevirir."""
+    lines = []
+    for stat in stats[:limit]:
+        frame = stat.traceback[0]
+        size_diff = getattr(stat, "size_diff", None)
+        diff_text = f" ({size_diff / 1024:+.1f} KiB)" if size_diff is not None else ""
+        lines.append(f"{frame.filename}:{frame.lineno}: {stat.size / 1024:.1f} KiB{diff_text}, {stat.count} blok")
+    return lines
+
+
+def take_memory_snapshot() -> tracemalloc.Snapshot:
+    """İlgisiz kayıtları (tracemalloc, import mekanizması) dışarıda bırakarak snapshot alır."""
+    gc.collect()
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+
+def report_memory(label: str, snapshot: tracemalloc.Snapshot, previous: Optional[tracemalloc.Snapshot], baseline: Optional[tracemalloc.Snapshot]):
+    """Top allocation'ları, büyüme farklarını ve bileşen muhasebesini konsola ve rapor dosyasına yazar."""
+    top_stats = snapshot.statistics('lineno')
+    report = {
+        "label": label,
+        "timestamp": time.time(),
+        "traced_bytes": sum(stat.size for stat in top_stats),
+        "components": collect_component_memory(snapshot),
+        "top_allocations": format_memory_stats(top_stats, MEMORY_PROFILE_TOP),
+    }
+    if previous is not None:
+        report["growth_since_previous"] = format_memory_stats(snapshot.compare_to(previous, 'lineno'), MEMORY_PROFILE_TOP)
+    if baseline is not None:
+        report["growth_since_startup"] = format_memory_stats(snapshot.compare_to(baseline, 'lineno'), MEMORY_PROFILE_TOP)
+
+    print(f"\n[BELLEK PROFİLİ] {label}")
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    try:
+        with open(MEMORY_PROFILE_REPORT_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(report, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"[UYARI] Bellek profili raporu yazılamadı: {e}", file=sys.stderr)
+
+
+# Sentetik sorguları ısınma kümesinin dışına çıkarmak için eklenen konu kelimeleri
+SYNTHETIC_LOAD_TOPICS = ["sabır", "namaz", "oruç", "adalet", "merhamet", "tövbe", "şükür", "ahiret", "infak", "dua"]
+
+
+def build_synthetic_load_queries(cycle: int, count: int) -> List[str]:
+    """Isınma kümesindeki sorguları konu kelimesi ve döngü numarasıyla bozarak her seferinde yeni sorgular üretir."""
+    warm_queries = build_warmup_queries(WARMUP_TOP_N) or UI_SAMPLE_QUERIES
+    return [
+        f"{warm_queries[i % len(warm_queries)]} {SYNTHETIC_LOAD_TOPICS[(i + cycle) % len(SYNTHETIC_LOAD_TOPICS)]} {cycle}-{i}"
+        for i in range(count)
+    ]
+
+
+def run_synthetic_load(queries: List[str]):
+    """Üretimdeki istek yolunu taklit eder: retrieval + istek başına genai.Client oluşturma (LLM çağrısı yapılmaz).
+       Retrieval önbelleği atlanır ve sorgular gömme önbelleğinde bulunmaz; böylece embedder ve MMR gerçekten çalışır."""
+    base_retriever = getattr(kuran_retriever, "retriever", kuran_retriever)
+    for query in queries:
+        base_retriever.invoke(query)
+        if GEMINI_API_KEY:
+            genai.Client(api_key=GEMINI_API_KEY)
+
+
+def memory_profile_loop():
+    """Başlangıç snapshot'ını alır, ardından periyodik olarak sentetik yük altında snapshot ve rapor üretir."""
+    baseline = take_memory_snapshot()
+    report_memory("startup", baseline, None, None)
+    previous = baseline
+    cycle = 0
+    while True:
+        time.sleep(MEMORY_PROFILE_INTERVAL)
+        cycle += 1
+        if kuran_retriever is not None:
+            try:
+                run_synthetic_load(build_synthetic_load_queries(cycle, MEMORY_PROFILE_LOAD_QUERIES))
+            except Exception as e:
+                print(f"[UYARI] Sentetik yük sırasında hata: {e}", file=sys.stderr)
+        snapshot = take_memory_snapshot()
+        report_memory(f"periodic-{cycle}", snapshot, previous, baseline)
+        previous = snapshot
+
+
+def start_memory_profiler():
+    """Profilleme açıksa arka plan thread'ini bir kez başlatır."""
+    global memory_profiler_thread
+    if not MEMORY_PROFILE_ENABLED or memory_profiler_thread is not None:
+        return
+    memory_profiler_thread = threading.Thread(target=memory_profile_loop, name="memory-profiler", daemon=True)
+    memory_profiler_thread.start()
+    print(f"Bellek profilleme açık: Rapor '{MEMORY_PROFILE_REPORT_PATH}' dosyasına yazılıyor ({MEMORY_PROFILE_INTERVAL} sn aralıkla).")
+
+
+
 # 4. RAG ZİNCİRİ
 
 # SYSTEM_INSTRUCTION GÜNCELLENDİ (Z Kuşağı + Saygı Kontrolü)
@@ -204,6 +673,21 @@ def setup_retriever(vector_db):
         search_kwargs={"k": 25, "fetch_k": 60, "lambda_mult": 0.5} # k ve fetch_k artırıldı
     )
 
+# --- RETRIEVAL SONUÇ ÖNBELLEĞİ ---
+
+def get_corpus_version(vector_db) -> str:
+    """Önbellek anahtarına eklenen korpus sürümü: Model, DB klasörü, parça sayısı veya DB dosyası değişirse eski kayıtlar kullanılmaz."""
+    # İçerik değişikliğini yakalamak için DB kaynağının (ZIP, yoksa chroma.sqlite3) boyutu ve değişiklik zamanı eklenir
+    content_stamp = "yok"
+    for source_path in (ZIP_FILE_NAME, os.path.join(VECTOR_DB_PATH, "chroma.sqlite3")):
+        if os.path.exists(source_path):
+            stat = os.stat(source_path)
+            content_stamp = f"{source_path}:{stat.st_size}:{stat.st_mtime_ns}"
+            break
+    fingerprint = f"{EMBEDDING_MODEL}|{VECTOR_DB_PATH}|{vector_db._collection.count()}|{content_stamp}"
+    return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:16]
+
+
 # --- HANDLER: SELAM, TEŞEKKÜR VE VEDA (Geri Dönüş Vibe'ına uygun) ---
 
 def handle_simple_greeting(query: str) -> str | None:
@@ -228,6 +712,10 @@ def handle_simple_greeting(query: str) -> str | None:
         
     return None
 
+def check_for_continue_query(query: str) -> bool:
+    """Kullanıcının önceki paylaşıma devam edilmesini isteyip istemediğini kontrol eder."""
+    return re.search(r'(devam\s*et|daha\s*fazla|sonrakini\s*göster|evet|hıhı|hı|açıklamaya\s*devam\s*et)', query, re.I)
+
 def check_for_history_query(query: str) -> bool:
     """Kullanıcının geçmişi hatırlamasını isteyip istemediğini kontrol eder."""
     lower_query = query.lower().strip()
@@ -353,7 +841,7 @@ def query_rag_system(query: str, kuran_retriever, all_documents: List[Document],
         query_for_model = "Lütfen bu sohbet geçmişini kısaca, eğlenceli, samimi ve bol emojili Z Kuşağı slangıyla özetle. Son konuşulan Sure/Ayet bilgisini de dahil et."
         
     # Özel Durum 2: Devam Et Kontrolü 
-    is_continue_query = re.search(r'(devam\s*et|daha\s*fazla|sonrakini\s*göster|evet|hıhı|hı|açıklamaya\s*devam\s*et)', last_user_query, re.I) 
+    is_continue_query = check_for_continue_query(last_user_query) 
 
     if is_continue_query:
         if last_retrieved_surah_info and sorgu_tipi != 4:
@@ -433,6 +921,7 @@ def query_rag_system(query: str, kuran_retriever, all_documents: List[Document],
     # Tek Ayet Sorgusu veya Normal RAG (Tip 0, 2)
     elif sorgu_tipi in [0, 2]:
         # DAHA FAZLA REFERANS İÇİN k artırıldı
+        record_query_traffic(last_user_query)
         docs = kuran_retriever.invoke(last_user_query) 
         query_for_model = last_user_query 
 
@@ -524,6 +1013,9 @@ def regenerate_last_response(history: List[List[str]], surah_state: Optional[Dic
     if not history:
         return history, surah_state
     
+    if MEMORY_PROFILE_ENABLED:
+        record_chat_history_stats(history)
+
     last_exchange = history.pop()
     last_query = last_exchange[0]
 
@@ -547,7 +1039,16 @@ all_documents = None
 system_status = "Başlatılıyor... Lütfen ZIP dosyasından DB yüklenmesini bekleyin. 🚀"
 
 
+initialization_lock = threading.Lock()
+
+
 def initialize_system() -> str:
+    """Sistemi başlatır. demo.load her sayfa yüklemesinde çağırdığı için eşzamanlı çağrılar sıraya alınır."""
+    with initialization_lock:
+        return _initialize_system_locked()
+
+
+def _initialize_system_locked() -> str:
     """Sistemi başlatır ve global değişkenleri ayarlar."""
     global kuran_retriever, all_documents, system_status
     
@@ -574,20 +1075,46 @@ def initialize_system() -> str:
             system_status = f"KRİTİK HATA: Vektör veritabanı yüklenemedi. Sebep: {e} 🛑"
             return system_status
 
-        kuran_retriever = setup_retriever(vector_db)
+        # Retriever, ısınma bitene kadar global'e atanmaz; böylece istekler soğuk sisteme düşmez
+        base_retriever = setup_retriever(vector_db)
+        retriever = base_retriever
+        if RETRIEVAL_CACHE_ENABLED:
+            try:
+                retrieval_cache = RetrievalCache(RETRIEVAL_CACHE_PATH, RETRIEVAL_CACHE_MAX_ENTRIES, RETRIEVAL_CACHE_TTL)
+                retriever = CachedRetriever(base_retriever, retrieval_cache, get_corpus_version(vector_db))
+            except Exception as e:
+                # Önbellek açılamazsa sistem doğrudan vektör aramasıyla çalışmaya devam eder
+                print(f"[UYARI] Retrieval önbelleği başlatılamadı: {e}", file=sys.stderr)
         
         system_status = "Retriever fonksiyon testi yapılıyor... ⚙️"
         try:
             test_query = "Kur'an'da namazdan bahsediyor mu?"
-            test_docs = kuran_retriever.invoke(test_query)
+            # Önbellek atlanır: Testin her açılışta gerçek vektör aramasını doğrulaması gerekir
+            test_docs = base_retriever.invoke(test_query)
             if len(test_docs) < 5: 
                 raise Exception(f"Retriever, test sorgusu için yeterli belge (En az 5) döndüremedi. Sadece {len(test_docs)} belge bulundu. 📉")
             print(f"✅ Sanity Check Başarılı: '{test_query}' için {len(test_docs)} belge bulundu.")
         except Exception as e:
              system_status = f"KRİTİK HATA: RAG Retriever testi başarısız oldu: {e}. 🐞"
-             kuran_retriever = None 
              return system_status
-            
+
+        persisted_traffic = load_query_traffic(QUERY_TRAFFIC_PATH)
+        with query_traffic_lock:
+            query_traffic_counts.clear()
+            query_traffic_counts.update(persisted_traffic)
+        start_query_traffic_writer()
+
+        if WARMUP_ENABLED:
+            system_status = "Model ve index ısıtılıyor (warmup)... 🔥"
+            try:
+                # Isınma önbelleği atlayarak gerçek vektör arama yolunu ısıtır
+                warmup_system(vector_db, base_retriever)
+            except Exception as e:
+                # Isınma başarısız olsa da sistem soğuk şekilde hizmet verebilir
+                print(f"[UYARI] Isınma sırasında hata: {e}", file=sys.stderr)
+
+        kuran_retriever = retriever
+        start_memory_profiler()
         system_status = "Sistem Hazır ve kullanıma açık. ✅ Hadi başlayalım! 🌟"
         return system_status
 
@@ -600,6 +1127,8 @@ def gradio_chat_handler(query: str, history: List[List[str]], last_retrieved_sur
     """Gradio sohbet handler'ı."""
     
     current_history = history if history is not None else []
+    if MEMORY_PROFILE_ENABLED:
+        record_chat_history_stats(current_history)
     
     response, new_state = query_rag_system(query, kuran_retriever, all_documents, current_history, last_retrieved_surah_info)
     
@@ -635,12 +1164,9 @@ with gr.Blocks(title="Kur'an Chatbot (Z Kuşağı Modu: ON)") as demo:
         
         | Konu Tipi | Örnek Sorgu | Vibe Durumu |
         | :--- | :--- | :--- |
-        | **Sure Parçalı Paylaşım** | `Bakara suresi` | Sureyi **part part** okuma **mood'u** ✨ |
-        | **Aralık Sorgusu** | `Fatiha 3. ayetten 5. ayete kadar yaz` | **Deep dive** yapma **vibe'ı** 🧐 |
-        | **Konu Sorgulama** | `Kuranda güzel söz söylemek` | **Aşırı** referans ayet ve **lit** yorumlar! 🔥 |
-        | **Kanonik Sayı** | `Kuranda toplam ayet ve sure sayısı kaçtır?` | Net bilgi: **114 Sure, 6236 Ayet**. **No cap.** 💯 |
-        | **Geçmiş Hatırlama** | `şimdiye kadar neler konuştuk?` | Sohbete **throwback** yapma zamanı. 🧠 |
         """
+        # Örnek satırlar UI_SAMPLE_QUERY_ROWS'tan üretilir (ısınma kümesiyle aynı liste)
+        + "".join(f"| **{konu}** | `{sorgu}` | {vibe} |\n        " for konu, sorgu, vibe in UI_SAMPLE_QUERY_ROWS)
     )
     
     # Durum (State) değişkeni: Hangi surede kaldığımızı ve sonraki ayeti tutar
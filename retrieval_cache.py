@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Retrieval sonuç önbelleği: Aynı (normalize) sorgu ve retriever ayarları için vektör araması atlanır.
+
+Yalnızca standart kütüphaneye bağlıdır; böylece app.py'nin ağır bağımlılıkları olmadan test edilebilir.
+"""
+import re
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+from contextlib import closing
+from typing import List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+
+class RetrievalCache:
+    """Retrieval sonuçlarını (belge id listeleri) SQLite'ta LRU + TTL ile saklar. Aynı dosyayı kullanan worker'lar önbelleği paylaşır."""
+
+    def __init__(self, db_path: str, max_entries: int, ttl_seconds: int):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS retrieval_cache ("
+                "cache_key TEXT PRIMARY KEY, doc_ids TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_retrieval_cache_last_access ON retrieval_cache (last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Gradio istekleri farklı thread'lerde çalıştığı için her işlemde yeni bağlantı açılır (closing ile kapatılır)
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def get(self, cache_key: str) -> List[str] | None:
+        """Geçerli kayıt varsa id listesini döndürür; süresi dolmuşsa siler."""
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute(
+                    "SELECT doc_ids, created_at FROM retrieval_cache WHERE cache_key = ?", (cache_key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM retrieval_cache WHERE cache_key = ?", (cache_key,))
+                    return None
+                conn.execute("UPDATE retrieval_cache SET last_access = ? WHERE cache_key = ?", (now, cache_key))
+                return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            print(f"[UYARI] Retrieval önbelleği okunamadı: {e}", file=sys.stderr)
+            return None
+
+    def put(self, cache_key: str, doc_ids: List[str]):
+        """Kaydı ekler; süresi dolanları ve LRU sınırını aşanları temizler."""
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO retrieval_cache (cache_key, doc_ids, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (cache_key, json.dumps(doc_ids), now, now)
+                )
+                conn.execute("DELETE FROM retrieval_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+                conn.execute(
+                    "DELETE FROM retrieval_cache WHERE cache_key IN ("
+                    "SELECT cache_key FROM retrieval_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+        except sqlite3.Error as e:
+            print(f"[UYARI] Retrieval önbelleğine yazılamadı: {e}", file=sys.stderr)
+
+
+def normalize_retrieval_query(query: str) -> str:
+    """Önbellek anahtarı için sorguyu normalize eder (küçük harf, tek boşluk, sondaki noktalama)."""
+    normalized = query.replace("I", "ı").replace("İ", "i").lower()
+    normalized = re.sub(r'\s+', ' ', normalized).strip()
+    return normalized.rstrip(' ?!.')
+
+
+class CachedRetriever:
+    """Retriever'ı sarar: Önbellekte id listesi varsa vektör araması (gömme + MMR) yapılmadan belgeler id ile çekilir."""
+
+    def __init__(self, retriever, cache: RetrievalCache, corpus_version: str):
+        self.retriever = retriever
+        self.cache = cache
+        self.corpus_version = corpus_version
+
+    @property
+    def vectorstore(self):
+        return self.retriever.vectorstore
+
+    def cache_key(self, query: str) -> str:
+        search_kwargs = self.retriever.search_kwargs
+        key_data = {
+            "query": normalize_retrieval_query(query),
+            "search_type": self.retriever.search_type,
+            "k": search_kwargs.get("k"),
+            "fetch_k": search_kwargs.get("fetch_k"),
+            "lambda_mult": search_kwargs.get("lambda_mult"),
+            "corpus_version": self.corpus_version,
+        }
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def invoke(self, query: str) -> List["Document"]:
+        cache_key = self.cache_key(query)
+
+        doc_ids = self.cache.get(cache_key)
+        if doc_ids:
+            try:
+                docs_by_id = {doc.id: doc for doc in self.vectorstore.get_by_ids(doc_ids)}
+                # get_by_ids sırayı garanti etmez; MMR sırası korunur
+                if all(doc_id in docs_by_id for doc_id in doc_ids):
+                    return [docs_by_id[doc_id] for doc_id in doc_ids]
+            except Exception as e:
+                # Önbellekteki belgeler çekilemezse normal vektör aramasına düşülür
+                print(f"[UYARI] Önbellekteki belgeler çekilemedi, vektör aramasına dönülüyor: {e}", file=sys.stderr)
+
+        docs = self.retriever.invoke(query)
+        doc_ids = [doc.id for doc in docs]
+        if docs and all(doc_ids):
+            self.cache.put(cache_key, doc_ids)
+        return docs
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+# app.py ve yardımcı modüller depo kökünde durur
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+import retrieval_cache
+from retrieval_cache import CachedRetriever, RetrievalCache, normalize_retrieval_query
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class FakeVectorStore:
+    def __init__(self, docs, fail=False):
+        self.docs = {doc.id: doc for doc in docs}
+        self.fail = fail
+        self.requested = []
+
+    def get_by_ids(self, ids):
+        self.requested.append(list(ids))
+        if self.fail:
+            raise RuntimeError("chroma hatası")
+        # Gerçek get_by_ids gibi sırayı garanti etmez
+        return [self.docs[doc_id] for doc_id in reversed(ids) if doc_id in self.docs]
+
+
+class FakeRetriever:
+    def __init__(self, docs, vectorstore, search_kwargs=None):
+        self.docs = docs
+        self.vectorstore = vectorstore
+        self.search_type = "mmr"
+        self.search_kwargs = search_kwargs or {"k": 25, "fetch_k": 60, "lambda_mult": 0.5}
+        self.queries = []
+
+    def invoke(self, query):
+        self.queries.append(query)
+        return list(self.docs)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock()
+    monkeypatch.setattr(retrieval_cache, "time", fake_clock)
+    return fake_clock
+
+
+@pytest.fixture
+def docs():
+    return [SimpleNamespace(id=f"doc-{i}", page_content=f"metin {i}") for i in range(3)]
+
+
+def make_cache(tmp_path, max_entries=10, ttl_seconds=100):
+    return RetrievalCache(str(tmp_path / "retrieval_cache.sqlite3"), max_entries, ttl_seconds)
+
+
+def count_rows(cache):
+    with sqlite3.connect(cache.db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM retrieval_cache").fetchone()[0]
+
+
+def test_normalize_retrieval_query():
+    assert normalize_retrieval_query("  Kuranda   GÜZEL söz?! ") == "kuranda güzel söz"
+    assert normalize_retrieval_query("İSRA IŞIK") == "isra ışık"
+    assert normalize_retrieval_query("namaz") == normalize_retrieval_query("Namaz.")
+
+
+def test_lru_evicts_least_recently_accessed(tmp_path, clock):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.put("a", ["1"])
+    clock.now += 1
+    cache.put("b", ["2"])
+    clock.now += 1
+    assert cache.get("a") == ["1"]  # a'nın last_access'i b'den yeni olur
+    clock.now += 1
+    cache.put("c", ["3"])
+
+    assert cache.get("a") == ["1"]
+    assert cache.get("b") is None
+    assert cache.get("c") == ["3"]
+
+
+def test_ttl_expires_on_get(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl_seconds=10)
+    cache.put("a", ["1"])
+    clock.now += 5
+    assert cache.get("a") == ["1"]
+    clock.now += 6  # get last_access'i günceller ama created_at'i değil
+    assert cache.get("a") is None
+    assert count_rows(cache) == 0
+
+
+def test_ttl_expired_entries_are_purged_on_put(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl_seconds=10)
+    cache.put("a", ["1"])
+    clock.now += 11
+    cache.put("b", ["2"])
+    assert count_rows(cache) == 1
+
+
+def test_cache_is_shared_between_instances(tmp_path, clock):
+    make_cache(tmp_path).put("a", ["1", "2"])
+    assert make_cache(tmp_path).get("a") == ["1", "2"]
+
+
+def test_cached_retriever_skips_search_on_hit(tmp_path, clock, docs):
+    base = FakeRetriever(docs, FakeVectorStore(docs))
+    retriever = CachedRetriever(base, make_cache(tmp_path), "v1")
+
+    assert retriever.invoke("Kuranda sabır") == docs
+    assert retriever.invoke("  kuranda SABIR? ") == docs  # sıra korunur
+    assert base.queries == ["Kuranda sabır"]
+    assert base.vectorstore.requested == [["doc-0", "doc-1", "doc-2"]]
+
+
+def test_cached_retriever_falls_back_when_ids_are_missing(tmp_path, clock, docs):
+    vectorstore = FakeVectorStore(docs[:2])
+    base = FakeRetriever(docs, vectorstore)
+    retriever = CachedRetriever(base, make_cache(tmp_path), "v1")
+
+    retriever.invoke("sabır")
+    assert retriever.invoke("sabır") == docs
+    assert len(base.queries) == 2
+
+
+def test_cached_retriever_falls_back_when_get_by_ids_fails(tmp_path, clock, docs):
+    base = FakeRetriever(docs, FakeVectorStore(docs, fail=True))
+    retriever = CachedRetriever(base, make_cache(tmp_path), "v1")
+
+    retriever.invoke("sabır")
+    assert retriever.invoke("sabır") == docs
+    assert len(base.queries) == 2
+
+
+def test_cached_retriever_does_not_cache_docs_without_ids(tmp_path, clock):
+    unnamed_docs = [SimpleNamespace(id=None, page_content="metin")]
+    base = FakeRetriever(unnamed_docs, FakeVectorStore([]))
+    cache = make_cache(tmp_path)
+    CachedRetriever(base, cache, "v1").invoke("sabır")
+    assert count_rows(cache) == 0
+
+
+def test_cache_key_depends_on_retriever_config_and_corpus_version(docs):
+    vectorstore = FakeVectorStore(docs)
+    base_key = CachedRetriever(FakeRetriever(docs, vectorstore), None, "v1").cache_key("sabır")
+
+    assert CachedRetriever(FakeRetriever(docs, vectorstore), None, "v1").cache_key("Sabır?") == base_key
+    assert CachedRetriever(FakeRetriever(docs, vectorstore), None, "v2").cache_key("sabır") != base_key
+    for changed in ({"k": 10}, {"fetch_k": 30}, {"lambda_mult": 0.7}):
+        search_kwargs = {"k": 25, "fetch_k": 60, "lambda_mult": 0.5, **changed}
+        other = CachedRetriever(FakeRetriever(docs, vectorstore, search_kwargs), None, "v1")
+        assert other.cache_key("sabır") != base_key
+
+    similarity = FakeRetriever(docs, vectorstore)
+    similarity.search_type = "similarity"
+    assert CachedRetriever(similarity, None, "v1").cache_key("sabır") != base_key
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+
+import pytest
+
+# app.py import anında torch/langchain/gradio yükler; bu bağımlılıklar yoksa testler atlanır
+app = pytest.importorskip("app")
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.document_calls = []
+        self.query_calls = []
+
+    def embed_documents(self, texts):
+        self.document_calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        self.query_calls.append(text)
+        return [float(len(text)), 2.0]
+
+
+@pytest.mark.parametrize("query", [
+    "selam",
+    "teşekkürler",
+    "Bakara suresi",
+    "Fatiha 3. ayetten 5. ayete kadar yaz",
+    "şimdiye kadar neler konuştuk?",
+    "devam et",
+])
+def test_reaches_retriever_excludes_non_rag_queries(query):
+    assert not app.reaches_retriever(query)
+
+
+@pytest.mark.parametrize("query", [
+    "Kuranda güzel söz söylemek",
+    "Bakara suresi ne anlatır?",
+])
+def test_reaches_retriever_accepts_rag_queries(query):
+    assert app.reaches_retriever(query)
+
+
+def test_build_warmup_queries_keeps_only_retrieval_queries(monkeypatch):
+    traffic = Counter({"Kuranda sabır": 5, "Bakara suresi": 9, "selam": 7})
+    monkeypatch.setattr(app, "query_traffic_counts", traffic)
+
+    queries = app.build_warmup_queries(top_n=10)
+
+    assert queries[0] == "Kuranda sabır"
+    assert "Kuranda güzel söz söylemek" in queries
+    for excluded in ("Bakara suresi", "selam", "Fatiha 3. ayetten 5. ayete kadar yaz", "şimdiye kadar neler konuştuk?"):
+        assert excluded not in queries
+    assert len(queries) == len(set(queries))
+
+
+def test_cached_query_embeddings_matches_exact_text_only():
+    base = FakeEmbeddings()
+    embeddings = app.CachedQueryEmbeddings(base)
+
+    assert embeddings.warm(["Namaz nasıl kılınır?", "Namaz nasıl kılınır?"]) == 1
+    assert base.document_calls == [["Namaz nasıl kılınır?"]]
+
+    assert embeddings.embed_query("Namaz nasıl kılınır?") == [20.0, 1.0]
+    assert base.query_calls == []
+
+    embeddings.embed_query("namaz nasıl kılınır")
+    assert base.query_calls == ["namaz nasıl kılınır"]
+
+
+def test_cached_query_embeddings_retain_and_persist(tmp_path):
+    cache_path = str(tmp_path / "query_embedding_cache.json")
+    embeddings = app.CachedQueryEmbeddings(FakeEmbeddings())
+    embeddings.warm(["eski sorgu", "yeni sorgu"])
+
+    assert embeddings.retain(["yeni sorgu"]) == 1
+    embeddings.save(cache_path)
+
+    reloaded = app.CachedQueryEmbeddings(FakeEmbeddings())
+    assert reloaded.load(cache_path) == 1
+    assert list(reloaded.query_cache) == ["yeni sorgu"]
+    assert not [name for name in tmp_path.iterdir() if name.suffix == ".tmp"]